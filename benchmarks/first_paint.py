@@ -0,0 +1,58 @@
+"""Cold-start budget for the Streamlit page.
+
+Runs the first render of ``color_g.py`` in a fresh interpreter and fails when it imports
+any of the analysis-only libraries or takes longer than the budget. Run from the repo root:
+
+    python benchmarks/first_paint.py [budget_ms]
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.environ.get("FIRST_PAINT_BUDGET_MS", 1000))
+HEAVY_MODULES = ("numpy", "cv2", "matplotlib", "reportlab", "pypdf", "pandas")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+rendered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "render_ms": (rendered - imported) * 1000,
+    "total_ms": (rendered - started) * 1000,
+    "heavy": [m for m in sys.argv[2:] if m in sys.modules],
+    "exception": [e.value for e in app.exception],
+}))
+"""
+
+
+def measure():
+    """First-render timings and the heavy modules it loaded, from a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", PROBE, os.path.join(ROOT, "color_g.py"), *HEAVY_MODULES],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(budget_ms=BUDGET_MS):
+    result = measure()
+    print(f"streamlit import {result['import_ms']:.0f} ms, first render {result['render_ms']:.0f} ms, "
+          f"total {result['total_ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+    problems = []
+    if result["exception"]:
+        problems.append(f"first render raised: {result['exception']}")
+    if result["heavy"]:
+        problems.append(f"first render imported {', '.join(result['heavy'])}")
+    if result["total_ms"] > budget_ms:
+        problems.append(f"cold start {result['total_ms']:.0f} ms exceeds {budget_ms:.0f} ms")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS))
@@ -1,70 +1,202 @@
 import streamlit as st
-import cv2
 import os
 import time
-import math
 import random
-import numpy as np
-import matplotlib.pyplot as plt
-from utils.color_detection import detect_colors
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas as pdf_canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
-
-COLORS = ["Red", "Blue", "Green", "Yellow", "Pink", "Violet"]
-
-def generate_pdf_report(data, pie_chart_path, feedback_text):
-    report_path = f"Color_Challenge_Report_{int(time.time())}.pdf"
-    pdf = pdf_canvas.Canvas(report_path, pagesize=A4)
-    width, height = A4
-
-    pdf.setStrokeColor(colors.black)
-    pdf.setLineWidth(3)
-    pdf.rect(30, 30, width - 60, height - 60)
-
-    pdf.setFont("Helvetica-Bold", 18)
-    pdf.setFillColor(colors.darkblue)
-    pdf.drawCentredString(width / 2, 780, "Color Arrangement Challenge Report")
-
-    y = 740
-    pdf.setFont("Helvetica-Bold", 14)
-    pdf.setFillColor(colors.darkblue)
-    pdf.drawString(100, y, "Performance Summary:")
-    y -= 25
-    pdf.setFont("Helvetica", 12)
-    pdf.setFillColor(colors.black)
-    for key, value in data.items():
-        line = f"{key}: {value}"
-        if len(line) > 90:
-            parts = [line[i:i+90] for i in range(0, len(line), 90)]
-            for part in parts:
-                pdf.drawString(100, y, part)
-                y -= 15
-        else:
-            pdf.drawString(100, y, line)
-            y -= 18
-    y -= 20
-
-    if os.path.exists(pie_chart_path):
-        chart_height = 250
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.setFillColor(colors.darkblue)
-        pdf.drawString(100, y, "Accuracy Overview:")
-        y -= chart_height + 40
-        pdf.drawImage(ImageReader(pie_chart_path), 150, y, width=300, height=chart_height)
-        y -= 40
-
-    pdf.setFont("Helvetica-Bold", 13)
-    pdf.setFillColor(colors.darkblue)
-    pdf.drawString(100, y, "Feedback:")
-    y -= 20
-    pdf.setFont("Helvetica", 12)
-    pdf.setFillColor(colors.black)
-    pdf.drawString(120, y, feedback_text)
-
-    pdf.save()
-    return report_path
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from utils.jobs import FAILED, JOB_TTL_SECONDS, QUEUED, JobManager, QueueFull
+from utils.profiles import list_profiles, palette_path, read_palette_definition
+from utils.thresholds import MIN_AREA
+
+PHOTO_TYPES = ["jpg", "jpeg", "png"]
+PALETTE_COLORS = read_palette_definition()["colors"]
+COLORS = [c["name"] for c in PALETTE_COLORS]
+DISPLAY_COLORS = {c["name"]: c.get("display", "#000000") for c in PALETTE_COLORS}
+REPORT_DIR = os.environ.get("COLOR_REPORT_DIR")
+JOB_POLL_SECONDS = 1.0
+
+@st.cache_resource(show_spinner="Loading the analysis engine...")
+def analysis_stack():
+    """Import OpenCV, NumPy, matplotlib, reportlab and pypdf on first use, once per process.
+
+    The first page only needs the palette names and the profile list, so these imports
+    (over a second together) are deferred until something is analyzed, calibrated or exported.
+    """
+    import cv2
+    from utils import (analysis, annotate, batch_report, boards, calibration, charts, color_detection,
+                       palette, report, roi, scoring, video)
+    return SimpleNamespace(cv2=cv2, analysis=analysis, annotate=annotate, batch_report=batch_report,
+                           boards=boards,
+                           calibration=calibration, charts=charts, detection=color_detection,
+                           palette=palette, report=report, roi=roi, scoring=scoring, video=video,
+                           persistence=report.directory_persistence(REPORT_DIR) if REPORT_DIR else None)
+
+@st.cache_resource
+def post_detection_pool():
+    """Threads shared by all sessions for the independent stages that follow detection."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="post-detection")
+
+@st.cache_resource
+def job_manager():
+    """Background analysis workers shared by all sessions; jobs outlive reruns and reconnects."""
+    return JobManager()
+
+@st.cache_data(max_entries=256, ttl=JOB_TTL_SECONDS, show_spinner=False)
+def cached_report(analysis_id, result_data, correct_count, total, feedback_text, file_name, _frame_jpeg):
+    """Build an analysis's PDF the first time its download is requested, then reuse it."""
+    stack = analysis_stack()
+    return stack.report.generate_pdf_report(result_data, correct_count, total, feedback_text, file_name,
+                                            stack.persistence, _frame_jpeg)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id):
+    """Progress of a running analysis, polled on a timer; reruns the page once the job ends."""
+    manager = job_manager()
+    job = manager.get(job_id)
+    if not job.active:
+        st.rerun()
+    if job.state == QUEUED:
+        position = manager.queue_position(job_id)
+        if position:
+            st.info(f"⏳ Waiting for a free analyzer: position {position} of {manager.queue_length()} "
+                    f"in the queue ({manager.workers} analyses run at a time).")
+            return
+    detail = f" · {job.done}/{job.total} frames" if job.total else ""
+    eta = job.eta()
+    if eta is not None:
+        detail += f" · about {eta:.0f} s left"
+    st.progress(min(job.done / job.total, 1.0) if job.total else 0.0, text=f"⏳ {job.stage}{detail}")
+
+def show_result(job):
+    """Render a finished analysis; the first time a session sees it, also record it for export."""
+    result = job.result
+    board_scores = result["board_scores"]
+    result_data = result["board_results"][0]
+    correct_count, accuracy = board_scores[0]["correct_count"], board_scores[0]["accuracy"]
+    total = len(result["target_order"])
+    feedback_text, feedback_level = result["feedback"][0]
+    frame_jpeg = result["frame_jpeg"]
+
+    first_view = st.session_state.get("shown_job") != job.id
+    if first_view:
+        st.session_state["shown_job"] = job.id
+        st.session_state["analysis_palette"] = result["palette"]
+        st.session_state["analysis_hsv"] = result["preview"]
+        st.session_state.setdefault("session_results", []).extend(
+            {"data": data, "correct_count": score["correct_count"], "total": total,
+             "feedback": feedback[0], "frame_jpeg": frame_jpeg}
+            for data, score, feedback in zip(result["board_results"], board_scores, result["feedback"]))
+        if analysis_stack().persistence:
+            post_detection_pool().submit(cached_report, job.id, result_data, correct_count, total,
+                                         feedback_text, result["report_name"], frame_jpeg)
+
+    if not result["found_boards"]:
+        st.warning("⚠️ No complete boards found; scoring an empty board.")
+    st.markdown('<div class="report-card">', unsafe_allow_html=True)
+    st.subheader("🧠 Performance Summary")
+    st.markdown(f"""
+    <div style='font-size:17px; line-height:1.8'>
+    <b>Arrangement Mode:</b> <span style='color:#FF00FF;'>{result_data['Arrangement Mode']}</span><br>
+    <b>Challenge Duration:</b> ⏱ {result["duration"]}<br>
+    <b>Generated Order:</b> {result_data['Generated Order']}<br>
+    <b>Detected Order:</b> {result_data['Detected Order']}<br>
+    </div>
+    """, unsafe_allow_html=True)
+    st.caption("Detection confidence: " + ", ".join(
+        f"{color} {d.confidence:.0%}" for color, d in result["boards"][0].items() if d))
+    if result["multi_board"]:
+        st.markdown("### 👥 Player Boards")
+        st.table([{"Board": i + 1,
+                   "Detected Order": ", ".join(score["detected_order"]),
+                   "Correctly Placed": score["correct_count"],
+                   "Accuracy (%)": score["accuracy"]}
+                  for i, score in enumerate(board_scores)])
+
+    st.markdown("### ⚙️ Accuracy Overview")
+    col_graph, col_frame = st.columns([1, 1.5])
+
+    with col_graph:
+        st.markdown(f"<h3 style='text-align:center;color:#FF00FF;'>🎯 Accuracy: {accuracy}%</h3>", unsafe_allow_html=True)
+        st.image(result["chart_png"])
+
+    with col_frame:
+        st.image(frame_jpeg, caption="🎨 Highlighted Color Positions")
+
+    getattr(st, feedback_level)(feedback_text)
+
+    st.download_button("📄 Download Report PDF",
+                       lambda: cached_report(job.id, result_data, correct_count, total,
+                                             feedback_text, result["report_name"], frame_jpeg),
+                       file_name=result["report_name"], mime="application/pdf", on_click="ignore")
+    if first_view:
+        st.balloons()
+        st.success("✅ Analysis Completed!")
+
+@st.fragment
+def threshold_tuner(palette, min_blob_area):
+    """HSV sliders previewed live on the cached HSV copy of the last analyzed frame.
+
+    Runs as a fragment, so a slider change (sent on release) reruns only the mask and blob
+    steps on the cached preview instead of decoding and converting the video again.
+    """
+    hsv, scale = st.session_state["analysis_hsv"]
+    stack = analysis_stack()
+    cv2 = stack.cv2
+    st.markdown("### 🎚️ Threshold Tuning")
+    color = st.selectbox("Color to tune", palette.names, key="tune_color")
+    lower, upper = palette.ranges[color][0]
+    key = f"tune_{palette.name}_{color}"
+
+    col_sliders, col_preview = st.columns([1, 1.5])
+    with col_sliders:
+        hue_from = st.slider("Hue from", 0, 179, lower[0], key=f"{key}_h0")
+        hue_to = st.slider("Hue to", 0, 179, upper[0], key=f"{key}_h1")
+        sat = st.slider("Saturation", 0, 255, (lower[1], upper[1]), key=f"{key}_s")
+        val = st.slider("Value", 0, 255, (lower[2], upper[2]), key=f"{key}_v")
+        st.caption("Hue wraps past 179 when 'from' is greater than 'to'.")
+
+    started = time.perf_counter()
+    tuned = ((hue_from, sat[0], val[0]), (hue_to, sat[1], val[1]))
+    mask = stack.palette.hsv_range_mask(hsv, *tuned)
+    blob = stack.detection.find_blob(mask, hsv[..., 1], min_area=max(1, int(min_blob_area / scale ** 2)))
+    preview = cv2.cvtColor(mask, cv2.COLOR_GRAY2RGB)
+    if blob:
+        cv2.circle(preview, (blob.x, blob.y), 15, (0, 255, 0), 2)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    with col_preview:
+        st.image(preview, caption=f"{color} mask · {'found' if blob else 'not found'} · {elapsed_ms:.0f} ms")
+    with col_sliders:
+        profile_name = st.text_input("Save as profile", key="tune_profile_name")
+        if st.button("💾 Save thresholds"):
+            data = stack.palette.palette_to_dict(palette)
+            data["name"] = profile_name
+            for entry in data["colors"]:
+                if entry["name"] == color:
+                    entry["hsv_ranges"] = [{"lower": list(tuned[0]), "upper": list(tuned[1])}]
+            try:
+                stack.calibration.save_profile(profile_name, stack.palette.palette_from_dict(data))
+                st.success(f"✅ Saved profile '{profile_name}'")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
+@st.fragment
+def challenge_controls():
+    """Arrangement mode, shuffle button and the current target order.
+
+    Runs as a fragment so switching mode or shuffling reruns only these widgets; the rest
+    of the page reads the choices from ``st.session_state`` on its next full run.
+    """
+    st.radio("🎮 Choose Arrangement Mode", ["Linear", "Circular"], key="arrangement_mode")
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button("🔀 Shuffle Colors"):
+            st.session_state["current_order"] = random.sample(COLORS, len(COLORS))
+    with col2:
+        order_html = ", ".join(f"<span style='color:{DISPLAY_COLORS[c]};'>{c}</span>"
+                               for c in st.session_state["current_order"])
+        st.markdown(f"<h3 style='color:dark blue;'>🧩 Current Order: {order_html}</h3>",
+                    unsafe_allow_html=True)
 
 st.set_page_config(page_title="🎮 Color Arrangement Challenge", layout="wide")
 
@@ -127,135 +259,110 @@ st.markdown("""
 
 st.markdown("<h1>🎨 COLOR PUZZLE ANALYSIS PORTAL 🎮</h1>", unsafe_allow_html=True)
 
-arrangement_mode = st.radio("🎮 Choose Arrangement Mode", ["Linear", "Circular"])
 if "current_order" not in st.session_state:
     st.session_state["current_order"] = COLORS
+challenge_controls()
+arrangement_mode = st.session_state["arrangement_mode"]
 
-col1, col2 = st.columns([1, 3])
-with col1:
-    if st.button("🔀 Shuffle Colors"):
-        st.session_state["current_order"] = random.sample(COLORS, len(COLORS))
-with col2:
-    st.markdown(f"<h3 style='color:dark blue;'>🧩 Current Order: {', '.join(st.session_state['current_order'])}</h3>", unsafe_allow_html=True)
-
-uploaded_video = st.file_uploader("🎥 Upload your challenge video", type=["mp4"])
-
-if uploaded_video and st.button("⚡ Analyze Video"):
-    video_path = f"temp_{time.time()}.mp4"
-    with open(video_path, "wb") as f:
-        f.write(uploaded_video.read())
-
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = frame_count / fps if fps > 0 else 0
-    minutes = int(duration // 60)
-    seconds = int(duration % 60)
-    video_duration = f"{minutes} min {seconds} sec"
-
-    last_frame = None
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        last_frame = frame
-    cap.release()
-
-    if last_frame is None:
-        st.error("❌ Could not read video frames.")
-    else:
-        detected_positions = detect_colors(last_frame)
-        if arrangement_mode.lower() == "linear":
-            colors_sorted = sorted(detected_positions.items(), key=lambda c: c[1][0] if c[1] else 9999)
-        else:
-            h, w, _ = last_frame.shape
-            cx, cy = w // 2, h // 2
-            def angle_from_top_clockwise(x, y):
-                dx, dy = x - cx, cy - y
-                angle = math.atan2(dx, -dy)
-                return (360 - (math.degrees(angle) - 240)) % 360
-            color_angles = [(angle_from_top_clockwise(pos[0], pos[1]), color)
-                            for color, pos in detected_positions.items() if pos]
-            color_angles.sort(key=lambda a: a[0])
-            colors_sorted = [(c, detected_positions[c]) for _, c in color_angles]
-
-        detected_order = [c[0] for c in colors_sorted if c[1] is not None]
-        correct_colors = [color for i, color in enumerate(st.session_state["current_order"])
-                          if i < len(detected_order) and detected_order[i] == color]
-        correct_count = len(correct_colors)
-        wrong_count = len(COLORS) - correct_count
-        accuracy = round((correct_count / len(COLORS)) * 100, 2)
-
-        result_data = {
-            "Arrangement Mode": arrangement_mode.title(),
-            "Generated Order": ", ".join(st.session_state["current_order"]),
-            "Detected Order": ", ".join(detected_order),
-            "Correctly Placed": correct_count,
-            "Correct Colors": ", ".join(correct_colors) if correct_colors else "None",
-            "Wrongly Placed": wrong_count,
-            "Accuracy (%)": accuracy,
-            "Challenge Duration": video_duration,
-            "Result": "Correct" if correct_count == len(COLORS) else "Incorrect"
-        }
-
-        st.markdown('<div class="report-card">', unsafe_allow_html=True)
-        st.subheader("🧠 Performance Summary")
-        st.markdown(f"""
-        <div style='font-size:17px; line-height:1.8'>
-        <b>Arrangement Mode:</b> <span style='color:#FF00FF;'>{result_data['Arrangement Mode']}</span><br>
-        <b>Challenge Duration:</b> ⏱ {video_duration}<br>
-        <b>Generated Order:</b> {result_data['Generated Order']}<br>
-        <b>Detected Order:</b> {result_data['Detected Order']}<br>
-        </div>
-        """, unsafe_allow_html=True)
-
-        st.markdown("### ⚙️ Accuracy Overview")
-        col_graph, col_frame = st.columns([1, 1.5])
-
-        pie_chart_path = "output/pie_chart.png"
-        with col_graph:
-            st.markdown(f"<h3 style='text-align:center;color:#FF00FF;'>🎯 Accuracy: {accuracy}%</h3>", unsafe_allow_html=True)
-            fig, ax = plt.subplots(figsize=(4, 4))
-            ax.pie(
-                [correct_count, wrong_count],
-                labels=["Correct", "Wrong"],
-                autopct="%1.1f%%",
-                startangle=90,
-                colors=["#7CFC00", "#FF6F61"],
-                textprops={"fontsize": 12, "color": "black"}
-            )
-            ax.axis("equal")
-            os.makedirs("output", exist_ok=True)
-            plt.savefig(pie_chart_path, bbox_inches="tight")
-            st.pyplot(fig)
-
-        with col_frame:
-            os.makedirs("output", exist_ok=True)
-            frame_copy = last_frame.copy()
-            for color, pos in detected_positions.items():
-                if pos:
-                    x, y = pos
-                    cv2.circle(frame_copy, (x, y), 40,
-                               (0, 255, 0) if color in correct_colors else (0, 0, 255), 3)
-                    cv2.putText(frame_copy, color, (x - 30, y - 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            highlighted_path = os.path.join("output", "highlighted_correct_colors.jpg")
-            cv2.imwrite(highlighted_path, frame_copy)
-            st.image(cv2.cvtColor(frame_copy, cv2.COLOR_BGR2RGB),
-                     caption="🎨 Highlighted Color Positions")
-
-        if accuracy >= 90:
-            feedback_text = "🏆 Excellent! You're a Color Master!"
-            st.success(feedback_text)
-        elif accuracy >= 70:
-            feedback_text = "🎯 Great job! Keep it up!"
-            st.info(feedback_text)
+with st.sidebar:
+    st.markdown("### 🎛️ Lighting Profile")
+    with st.expander("🎯 Calibrate a new profile"):
+        st.caption("Upload a photo of the board with the colors laid out in the current order.")
+        profile_name = st.text_input("Profile name")
+        reference_photo = st.file_uploader("Reference photo", type=PHOTO_TYPES)
+        if reference_photo and st.button("Calibrate"):
+            stack = analysis_stack()
+            reference = stack.video.decode_image(reference_photo.getvalue())
+            try:
+                if reference is None:
+                    raise ValueError("Could not read the photo.")
+                calibrated = stack.calibration.calibrate_palette(
+                    reference, st.session_state["current_order"], stack.palette.load_palette(),
+                    arrangement_mode, profile_name)
+                stack.calibration.save_profile(profile_name, calibrated)
+                st.success(f"✅ Saved profile '{profile_name}'")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+    profile = st.selectbox("Color profile", ["Default"] + list_profiles())
+    normalize_lighting = st.checkbox("🌗 Normalize lighting", help="Correct dim or tinted videos "
+                                     "using white balance estimated once from a few frames.")
+    min_blob_area = st.slider("Minimum blob area (px)", 0, 2000, MIN_AREA, step=10,
+                              help="Color patches smaller than this are treated as noise.")
+    multi_board = st.checkbox("👥 Multi-board mode", help="Score every board visible in the video "
+                              "separately, e.g. two players side by side.")
+    with st.expander("📐 Board region"):
+        st.caption("Restrict detection to the board to ignore background clutter.")
+        roi_shape = st.radio("Region shape", ["Full frame", "Rectangle", "Circle"], key="roi_shape")
+        if roi_shape == "Rectangle":
+            x_range = st.slider("Horizontal extent (%)", 0, 100, (0, 100), key="roi_x")
+            y_range = st.slider("Vertical extent (%)", 0, 100, (0, 100), key="roi_y")
+            st.session_state["board_roi"] = {"shape": "rect", "x0": x_range[0] / 100, "x1": x_range[1] / 100,
+                                             "y0": y_range[0] / 100, "y1": y_range[1] / 100}
+        elif roi_shape == "Circle":
+            roi_cx = st.slider("Centre x (%)", 0, 100, 50, key="roi_cx")
+            roi_cy = st.slider("Centre y (%)", 0, 100, 50, key="roi_cy")
+            roi_r = st.slider("Radius (% of shorter side)", 5, 100, 50, key="roi_r")
+            st.session_state["board_roi"] = {"shape": "circle", "cx": roi_cx / 100, "cy": roi_cy / 100,
+                                             "r": roi_r / 100}
         else:
-            feedback_text = "⚡ Try again to improve your score!"
-            st.warning(feedback_text)
+            st.session_state["board_roi"] = None
+palette_file = palette_path(profile)
 
-        pdf_path = generate_pdf_report(result_data, pie_chart_path, feedback_text)
-        with open(pdf_path, "rb") as f:
-            st.download_button("📄 Download Report PDF", f, file_name=os.path.basename(pdf_path))
-        st.balloons()
-        st.success("✅ Analysis Completed!")
+player_name = st.text_input("👤 Player name (optional)")
+uploaded_video = st.file_uploader("🎥 Upload your challenge video or 📷 a photo of the final board",
+                                  type=["mp4"] + PHOTO_TYPES)
+is_photo = bool(uploaded_video) and uploaded_video.name.rsplit(".", 1)[-1].lower() in PHOTO_TYPES
+raw_yuv = False
+if uploaded_video and not is_photo and analysis_stack().video.raw_yuv_supported():
+    with st.sidebar:
+        raw_yuv = st.checkbox("🎞️ Raw YUV decoding", help="Skip the decoder's BGR conversion and classify "
+                              "colors from the YUV planes. Ignored with lighting normalization.")
+
+if uploaded_video and st.button(f"⚡ Analyze {'Photo' if is_photo else 'Video'}"):
+    running = job_manager().get(st.session_state.get("analysis_job", ""))
+    if running and running.active:
+        st.warning("⚠️ Your previous analysis is still in progress; wait for it to finish.")
+    else:
+        try:
+            job_id = job_manager().submit(
+                analysis_stack().analysis.analyze_upload, uploaded_video.getvalue(), is_photo,
+                list(st.session_state["current_order"]), arrangement_mode, palette_file=palette_file,
+                roi=st.session_state["board_roi"], min_area=min_blob_area, normalize=normalize_lighting,
+                raw_yuv=raw_yuv, multi_board=multi_board, player=player_name, pool=post_detection_pool())
+            st.session_state["analysis_job"] = job_id
+            st.query_params["job"] = job_id
+        except QueueFull as e:
+            st.error(f"❌ {e}")
+
+job_id = st.session_state.get("analysis_job") or st.query_params.get("job")
+job = job_manager().get(job_id) if job_id else None
+if job_id and job is None:
+    st.session_state.pop("analysis_job", None)
+    st.query_params.pop("job", None)
+    st.warning("⚠️ That analysis has expired or is no longer available; please analyze again.")
+elif job:
+    st.session_state["analysis_job"] = job.id
+    if job.active:
+        job_progress(job.id)
+    elif job.state == FAILED:
+        st.error(f"❌ {job.error}")
+    else:
+        show_result(job)
+
+if "analysis_hsv" in st.session_state:
+    threshold_tuner(st.session_state["analysis_palette"], min_blob_area)
+
+if st.session_state.get("session_results"):
+    session_results = list(st.session_state["session_results"])
+    st.markdown("### 📚 Session Export")
+    st.caption(f"{len(session_results)} result(s) recorded in this session.")
+    col_export, col_clear = st.columns([1, 1])
+    with col_export:
+        st.download_button("📚 Download Session PDF",
+                           lambda: analysis_stack().batch_report.export_batch_pdf(session_results),
+                           file_name=f"Color_Challenge_Session_{int(time.time())}.pdf",
+                           mime="application/pdf", on_click="ignore")
+    with col_clear:
+        if st.button("🗑️ Clear Session Results"):
+            st.session_state["session_results"] = []
+            st.rerun()
@@ -0,0 +1,78 @@
+from utils.annotate import annotate_boards, encode_jpeg
+from utils.boards import board_center, group_boards
+from utils.charts import pie_chart_png
+from utils.color_detection import (MIN_AREA, detect_color_blobs, detect_color_details, positions_of,
+                                   preview_hsv)
+from utils.palette import load_palette
+from utils.profiles import DEFAULT_PALETTE_PATH
+from utils.report import feedback_for, report_file_name, result_summary
+from utils.roi import roi_center
+from utils.scoring import order_colors, score_order
+from utils.video import decode_image, read_video, to_bgr
+
+def analyze_upload(data, is_photo, target_order, mode, palette_file=DEFAULT_PALETTE_PATH, roi=None,
+                   min_area=MIN_AREA, normalize=False, raw_yuv=False, multi_board=False, player=None,
+                   pool=None, progress=None):
+    """Run the whole analysis of an uploaded video or photo and return everything the UI shows.
+
+    ``progress(stage, done, total)`` is called as the analysis advances; decoding reports
+    frames. The chart, annotated frame and tuning preview are built on ``pool`` when given.
+    Raises ``ValueError`` when the upload cannot be decoded.
+    """
+    progress = progress or (lambda stage, done=0, total=None: None)
+    palette = load_palette(palette_file)
+    if is_photo:
+        progress("Decoding photo")
+        analysis_frame = decode_image(data, normalize=normalize)
+        duration = "N/A (photo)"
+    else:
+        analysis_frame, seconds = read_video(
+            data, normalize=normalize, raw_yuv=raw_yuv,
+            progress=lambda done, total: progress("Decoding video", done, total))
+        duration = f"{int(seconds // 60)} min {int(seconds % 60)} sec"
+    if analysis_frame is None:
+        raise ValueError("Could not read the photo." if is_photo else "Could not read video frames.")
+
+    progress("Detecting colors")
+    last_frame = to_bgr(analysis_frame)
+    if multi_board:
+        boards = group_boards(detect_color_blobs(analysis_frame, palette, roi, min_area=min_area))
+        centers = [board_center(b) for b in boards]
+    else:
+        boards = [detect_color_details(analysis_frame, palette, roi, min_area=min_area)]
+        centers = [roi_center(roi, last_frame.shape)]
+    found_boards = bool(boards)
+    if not boards:
+        boards, centers = [{color: None for color in palette.names}], [roi_center(roi, last_frame.shape)]
+
+    progress("Scoring")
+    board_scores = [score_order(target_order, order_colors(positions_of(b), mode, c))
+                    for b, c in zip(boards, centers)]
+    players = ([f"{player or 'Board'} #{i + 1}" for i in range(len(boards))] if multi_board else [player])
+    board_results = [result_summary(mode, target_order, score, duration, name)
+                     for score, name in zip(board_scores, players)]
+
+    progress("Rendering charts")
+    stages = [lambda: pie_chart_png(board_scores[0]["correct_count"], len(target_order)),
+              lambda: encode_jpeg(annotate_boards(last_frame, boards, board_scores)),
+              lambda: preview_hsv(last_frame, roi)]
+    if pool:
+        chart_png, frame_jpeg, preview = [f.result() for f in [pool.submit(stage) for stage in stages]]
+    else:
+        chart_png, frame_jpeg, preview = [stage() for stage in stages]
+
+    return {
+        "palette": palette,
+        "target_order": target_order,
+        "multi_board": multi_board,
+        "found_boards": found_boards,
+        "boards": boards,
+        "board_scores": board_scores,
+        "board_results": board_results,
+        "duration": duration,
+        "feedback": [feedback_for(score["accuracy"]) for score in board_scores],
+        "report_name": report_file_name(),
+        "chart_png": chart_png,
+        "frame_jpeg": frame_jpeg,
+        "preview": preview,
+    }
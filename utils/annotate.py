@@ -0,0 +1,35 @@
+import os
+
+import cv2
+
+DISPLAY_MAX_WIDTH = int(os.environ.get("COLOR_DISPLAY_MAX_WIDTH", "800"))
+JPEG_QUALITY = int(os.environ.get("COLOR_JPEG_QUALITY", "85"))
+
+def annotate_boards(frame, boards, board_scores, max_width=DISPLAY_MAX_WIDTH):
+    """Display-sized copy of the frame with each detected color circled green (correct) or red (wrong).
+
+    The frame is shrunk to ``max_width`` before drawing and detection coordinates are scaled
+    to match, so a 4K frame costs no more to annotate, encode and send than a small one.
+    """
+    h, w = frame.shape[:2]
+    scale = min(1.0, max_width / float(w)) if max_width else 1.0
+    if scale < 1.0:
+        annotated = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    else:
+        annotated = frame.copy()
+    for board, score in zip(boards, board_scores):
+        for color, detection in board.items():
+            if detection:
+                x, y = int(detection.x * scale), int(detection.y * scale)
+                cv2.circle(annotated, (x, y), 40,
+                           (0, 255, 0) if color in score["correct_colors"] else (0, 0, 255), 3)
+                cv2.putText(annotated, color, (x - 30, y - 50),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return annotated
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """Encode a BGR frame once to JPEG bytes, usable by both ``st.image`` and the PDF report."""
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode the annotated frame")
+    return encoded.tobytes()
@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from utils.report import draw_report_page
+
+PAGES_PER_WORKER = 500
+
+def render_pages(records):
+    """Render result records as consecutive pages of one PDF and return its bytes.
+
+    Each record is ``{"data", "correct_count", "total", "feedback"}`` plus an optional
+    ``"frame_jpeg"``, the same inputs as :func:`utils.report.generate_pdf_report`.
+    """
+    buffer = BytesIO()
+    pdf = pdf_canvas.Canvas(buffer, pagesize=A4)
+    for record in records:
+        draw_report_page(pdf, record["data"], record["correct_count"], record["total"], record["feedback"],
+                         record.get("frame_jpeg"))
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def export_batch_pdf(records, workers=None):
+    """Render many players' reports into a single multi-page PDF and return its bytes.
+
+    Records are split into contiguous chunks rendered by worker processes, then the parts
+    are concatenated in order and identical objects (page chrome forms, fonts, repeated
+    charts and images) are stored once. Small batches render in-process, where starting
+    workers would cost more than it saves.
+    """
+    records = list(records)
+    if not records:
+        raise ValueError("No results to export")
+    if workers is None:
+        workers = min(os.cpu_count() or 1, -(-len(records) // PAGES_PER_WORKER))
+    if workers <= 1:
+        return render_pages(records)
+
+    size = -(-len(records) // workers)
+    chunks = [records[i:i + size] for i in range(0, len(records), size)]
+    with ProcessPoolExecutor(len(chunks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = list(pool.map(render_pages, chunks))
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(BytesIO(part)))
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,67 @@
+import numpy as np
+
+LINK_FACTOR = 3.0
+GAP_FACTOR = 2.0
+MIN_BOARD_COLORS = 2
+
+def group_boards(blobs, link_factor=LINK_FACTOR, gap_factor=GAP_FACTOR, min_colors=MIN_BOARD_COLORS):
+    """Cluster detected blobs into boards, one per player, ordered left to right.
+
+    ``blobs`` is ``{color: [Detection]}``. Blobs are joined by single linkage: two blobs
+    share a board when their centroids are closer than ``link_factor`` patch widths (the
+    square root of the median blob area) or ``gap_factor`` times the median spanning-tree
+    edge, whichever is larger, so the spacing within a board sets the scale. Each board
+    keeps the largest blob per color and is returned as ``{color: Detection or None}``;
+    clusters with fewer than ``min_colors`` colors are discarded as clutter.
+    """
+    flat = [(color, d) for color, found in blobs.items() for d in found]
+    if not flat:
+        return []
+
+    points = np.array([(d.x, d.y) for _, d in flat], dtype=np.float64)
+    distances = np.hypot(points[:, None, 0] - points[None, :, 0], points[:, None, 1] - points[None, :, 1])
+    link = link_factor * np.sqrt(np.median([d.area for _, d in flat]))
+    if len(flat) > 2:
+        link = max(link, gap_factor * np.median(_spanning_tree_edges(distances)))
+
+    parent = list(range(len(flat)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(distances <= link, k=1))):
+        parent[root(i)] = root(j)
+
+    clusters = {}
+    for i, (color, d) in enumerate(flat):
+        board = clusters.setdefault(root(i), {})
+        if color not in board or d.area > board[color].area:
+            board[color] = d
+
+    boards = [{color: board.get(color) for color in blobs}
+              for board in clusters.values() if len(board) >= min_colors]
+    boards.sort(key=lambda b: board_center(b)[0])
+    return boards
+
+def _spanning_tree_edges(distances):
+    """Edge lengths of the minimum spanning tree of a distance matrix (Prim's algorithm)."""
+    n = len(distances)
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = distances[0].copy()
+    edges = []
+    for _ in range(n - 1):
+        best[in_tree] = np.inf
+        j = int(np.argmin(best))
+        edges.append(best[j])
+        in_tree[j] = True
+        best = np.minimum(best, distances[j])
+    return edges
+
+def board_center(board):
+    """Mean centroid of the blobs on a board, used as the pivot for circular ordering."""
+    found = [d for d in board.values() if d]
+    return (int(np.mean([d.x for d in found])), int(np.mean([d.y for d in found])))
@@ -0,0 +1,111 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from utils.palette import HUE_MAX, palette_from_dict, palette_to_dict
+from utils.profiles import PROFILE_DIR, profile_path
+from utils.scoring import order_colors
+
+MIN_SATURATION = 60
+MIN_VALUE = 50
+MIN_PEAK_PIXELS = 50
+PEAK_SEPARATION = 6
+PEAK_FRACTION = 0.15
+LOWER_PERCENTILE = 5
+FLOOR_MARGIN = 20
+MIN_HALF_WIDTH = 4
+
+def calibrate_palette(frame, expected_order, base_palette, mode="linear", name="calibrated"):
+    """Fit per-color HSV ranges from one reference frame whose colors appear in ``expected_order``.
+
+    The hue histogram of saturated pixels is searched for one peak per expected color; each
+    peak's span, cut at the midpoint to its neighbours, becomes that color's hue range, and
+    the saturation/value floors come from the pixels inside the span. Peaks are matched to
+    names by ordering their centroids exactly like a scored arrangement.
+    """
+    if sorted(expected_order) != sorted(base_palette.names):
+        raise ValueError(f"Reference order must list every color of palette "
+                         f"'{base_palette.name}' exactly once")
+
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    hue, sat, val = cv2.split(hsv)
+    chroma = (sat >= MIN_SATURATION) & (val >= MIN_VALUE)
+    hist = np.bincount(hue[chroma], minlength=HUE_MAX)[:HUE_MAX].astype(np.float64)
+    smooth = sum(np.roll(hist, k) for k in range(-2, 3))
+
+    peaks = _find_peaks(smooth, len(expected_order))
+    spans = _peak_spans(smooth, peaks)
+
+    fitted, positions = {}, {}
+    for i, (lo, hi) in enumerate(spans):
+        in_span = (hue >= lo) & (hue <= hi) if lo <= hi else (hue >= lo) | (hue <= hi)
+        pixels = chroma & in_span
+        ys, xs = np.nonzero(pixels)
+        s_lo = max(MIN_SATURATION, int(np.percentile(sat[pixels], LOWER_PERCENTILE)) - FLOOR_MARGIN)
+        v_lo = max(MIN_VALUE, int(np.percentile(val[pixels], LOWER_PERCENTILE)) - FLOOR_MARGIN)
+        fitted[i] = ((lo, s_lo, v_lo), (hi, 255, 255))
+        positions[i] = (int(xs.mean()), int(ys.mean()))
+
+    h, w = hue.shape
+    ordered = order_colors(positions, mode, (w // 2, h // 2))
+    ranges = {color: [fitted[i]] for color, i in zip(expected_order, ordered)}
+
+    data = palette_to_dict(base_palette)
+    data["name"] = name
+    for entry in data["colors"]:
+        entry["hsv_ranges"] = [{"lower": list(lower), "upper": list(upper)}
+                               for lower, upper in ranges[entry["name"]]]
+    return palette_from_dict(data)
+
+def _find_peaks(hist, count):
+    """Pick the ``count`` strongest hue peaks at least PEAK_SEPARATION bins apart."""
+    remaining = hist.copy()
+    peaks = []
+    for _ in range(count):
+        peak = int(np.argmax(remaining))
+        if remaining[peak] < MIN_PEAK_PIXELS:
+            raise ValueError(f"Found {len(peaks)} distinct colors in the reference frame, "
+                             f"expected {count}")
+        peaks.append(peak)
+        for k in range(-PEAK_SEPARATION, PEAK_SEPARATION + 1):
+            remaining[(peak + k) % HUE_MAX] = 0
+    return peaks
+
+def _peak_spans(hist, peaks):
+    """Grow each peak while the histogram stays above PEAK_FRACTION of its height.
+
+    Every span is at least MIN_HALF_WIDTH bins either side of its peak, but growth always
+    stops halfway to the neighbouring peak so fitted ranges never overlap.
+    """
+    ordered = sorted(peaks)
+    limits = {}
+    for i, peak in enumerate(ordered):
+        if len(ordered) == 1:
+            left_gap = right_gap = HUE_MAX // 2
+        else:
+            left_gap = (peak - ordered[i - 1]) % HUE_MAX
+            right_gap = (ordered[(i + 1) % len(ordered)] - peak) % HUE_MAX
+        limits[peak] = ((left_gap - 1) // 2, (right_gap - 1) // 2)
+
+    spans = []
+    for peak in peaks:
+        floor = hist[peak] * PEAK_FRACTION
+        max_left, max_right = limits[peak]
+        left = min(MIN_HALF_WIDTH, max_left)
+        while left < max_left and hist[(peak - left - 1) % HUE_MAX] > floor:
+            left += 1
+        right = min(MIN_HALF_WIDTH, max_right)
+        while right < max_right and hist[(peak + right + 1) % HUE_MAX] > floor:
+            right += 1
+        spans.append(((peak - left) % HUE_MAX, (peak + right) % HUE_MAX))
+    return spans
+
+def save_profile(name, palette):
+    """Persist a calibrated palette under ``name`` for later analyses."""
+    path = profile_path(name)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(palette_to_dict(palette), f, indent=2)
+    return path
@@ -0,0 +1,27 @@
+from functools import lru_cache
+from io import BytesIO
+
+from matplotlib.figure import Figure
+
+@lru_cache(maxsize=None)
+def pie_chart_png(correct_count, total):
+    """PNG bytes of the accuracy pie chart, rendered once per distinct result.
+
+    There are only ``total + 1`` possible charts, so after warm-up every request is a
+    dictionary lookup. A bare ``Figure`` is used instead of pyplot so nothing is left
+    open in pyplot's global figure registry.
+    """
+    fig = Figure(figsize=(4, 4))
+    ax = fig.subplots()
+    ax.pie(
+        [correct_count, total - correct_count],
+        labels=["Correct", "Wrong"],
+        autopct="%1.1f%%",
+        startangle=90,
+        colors=["#7CFC00", "#FF6F61"],
+        textprops={"fontsize": 12, "color": "black"}
+    )
+    ax.axis("equal")
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
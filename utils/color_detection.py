@@ -1,63 +1,127 @@
+from collections import namedtuple
+
 import cv2
 import numpy as np
+from utils.palette import load_palette
+from utils.roi import crop_to_roi
+from utils.thresholds import MIN_AREA, MIN_FILL_RATIO, MIN_SATURATION
+from utils.video import chroma_yuv, is_i420, to_bgr
+
+PREVIEW_WIDTH = 480
+
+Detection = namedtuple("Detection", ["x", "y", "area", "fill_ratio", "mean_saturation", "confidence"])
 
-def find_centroid(mask):
-    """Find the centroid (x, y) of the largest contour in a binary mask."""
+def iter_blobs(mask, saturation, min_area=MIN_AREA, min_fill_ratio=MIN_FILL_RATIO,
+               min_saturation=MIN_SATURATION, offset=(0, 0), scale=1):
+    """Yield the blobs of a binary mask that pass the quality thresholds, largest first.
+
+    Outer contours below ``min_area`` are discarded on their contour area alone; fill ratio
+    (area over bounding box) and mean saturation are only computed for the survivors, the
+    latter within the bounding box. When the mask covers a crop of the frame, or a reduced
+    resolution of it, centroids are mapped back as ``offset + scale * centroid`` and areas
+    are reported in frame pixels.
+    """
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    if contours:
-        c = max(contours, key=cv2.contourArea)
-        M = cv2.moments(c)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            return (cx, cy)
-    return None
-
-def detect_colors(frame):
-    """Detect red, blue, green, yellow, pink, and violet objects and return their centroid positions."""
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-  
-    lower_red1 = np.array([0, 120, 70])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 120, 70])
-    upper_red2 = np.array([180, 255, 255])
-
-   
-    lower_blue = np.array([100, 150, 0])
-    upper_blue = np.array([140, 255, 255])
-
-    
-    lower_green = np.array([40, 70, 70])
-    upper_green = np.array([80, 255, 255])
-
-    lower_yellow = np.array([20, 100, 100])
-    upper_yellow = np.array([30, 255, 255])
-
-    
-    lower_pink = np.array([160, 100, 100])
-    upper_pink = np.array([170, 255, 255])
-
-   
-    lower_violet = np.array([130, 100, 100])
-    upper_violet = np.array([150, 255, 255])
-
-    
-    mask_red = cv2.inRange(hsv, lower_red1, upper_red1) | cv2.inRange(hsv, lower_red2, upper_red2)
-    mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-    mask_green = cv2.inRange(hsv, lower_green, upper_green)
-    mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-    mask_pink = cv2.inRange(hsv, lower_pink, upper_pink)
-    mask_violet = cv2.inRange(hsv, lower_violet, upper_violet)
-
-   
-    positions = {
-        "Red": find_centroid(mask_red),
-        "Blue": find_centroid(mask_blue),
-        "Green": find_centroid(mask_green),
-        "Yellow": find_centroid(mask_yellow),
-        "Pink": find_centroid(mask_pink),
-        "Violet": find_centroid(mask_violet)
-    }
-
-    return positions
+    min_pixels = min_area / float(scale * scale)
+    areas = [cv2.contourArea(c) for c in contours]
+    candidates = [i for i, area in enumerate(areas) if area >= min_pixels]
+
+    for i in sorted(candidates, key=lambda i: areas[i], reverse=True):
+        contour = contours[i]
+        x, y, w, h = cv2.boundingRect(contour)
+        fill_ratio = areas[i] / float(w * h)
+        if fill_ratio < min_fill_ratio:
+            continue
+        blob = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(blob, [contour], -1, 255, cv2.FILLED, offset=(-x, -y))
+        mean_saturation = cv2.mean(saturation[y:y + h, x:x + w], mask=blob)[0]
+        if mean_saturation < min_saturation:
+            continue
+        m = cv2.moments(contour)
+        cx, cy = (m["m10"] / m["m00"], m["m01"] / m["m00"]) if m["m00"] else (x + w / 2, y + h / 2)
+        confidence = round(fill_ratio * mean_saturation / 255.0, 3)
+        yield Detection(int(cx * scale) + offset[0], int(cy * scale) + offset[1],
+                        int(areas[i] * scale * scale), round(fill_ratio, 3), round(mean_saturation, 1),
+                        confidence)
+
+def find_blob(mask, saturation, **thresholds):
+    """Return the largest blob in a binary mask that passes the quality thresholds, or None."""
+    return next(iter_blobs(mask, saturation, **thresholds), None)
+
+def _classify(frame, palette, roi):
+    """Crop to the board region, label every pixel and count the pixels of each label.
+
+    BGR frames are converted to HSV; raw I420 frames (see ``utils.video``) are classified
+    from their YUV planes at chroma resolution, i.e. with a scale of 2.
+    """
+    if is_i420(frame):
+        crop, offset, inside = crop_to_roi(chroma_yuv(frame), roi)
+        labels, saturation = palette.classify_yuv(crop)
+        scale = 2
+    else:
+        crop, offset, inside = crop_to_roi(frame, roi)
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        labels, saturation = palette.classify(hsv), hsv[..., 1]
+        scale = 1
+    if inside is not None:
+        labels[~inside] = 0
+    bins = len(palette.names) + 1
+    pixel_counts = cv2.calcHist([labels], [0], None, [bins], [0, bins]).ravel() * (scale * scale)
+    return labels, saturation, (offset[0] * scale, offset[1] * scale), scale, pixel_counts
+
+def _color_blobs(frame, palette, roi, thresholds):
+    """Yield ``(color, blobs)`` per palette color, where ``blobs`` iterates its qualifying blobs.
+
+    Colors whose total pixel count is below the minimum area cannot hold a qualifying blob
+    and get an empty iterator without a mask ever being built.
+    """
+    palette = palette or load_palette()
+    labels, saturation, offset, scale, pixel_counts = _classify(frame, palette, roi)
+    for label, color in enumerate(palette.names, start=1):
+        if pixel_counts[label] < max(thresholds["min_area"], 1):
+            yield color, iter(())
+        else:
+            mask = (labels == label).view(np.uint8)
+            yield color, iter_blobs(mask, saturation, offset=offset, scale=scale, **thresholds)
+
+def detect_color_details(frame, palette=None, roi=None, min_area=MIN_AREA,
+                         min_fill_ratio=MIN_FILL_RATIO, min_saturation=MIN_SATURATION):
+    """Detect every palette color in the frame and return a Detection (or None) per color.
+
+    ``roi`` restricts the search to a board region (see ``utils.roi``); only the cropped
+    pixels are converted and classified.
+    """
+    thresholds = dict(min_area=min_area, min_fill_ratio=min_fill_ratio, min_saturation=min_saturation)
+    return {color: next(blobs, None) for color, blobs in _color_blobs(frame, palette, roi, thresholds)}
+
+def detect_color_blobs(frame, palette=None, roi=None, min_area=MIN_AREA,
+                       min_fill_ratio=MIN_FILL_RATIO, min_saturation=MIN_SATURATION):
+    """Detect every qualifying blob of each palette color, largest first, as ``{color: [Detection]}``."""
+    thresholds = dict(min_area=min_area, min_fill_ratio=min_fill_ratio, min_saturation=min_saturation)
+    return {color: list(blobs) for color, blobs in _color_blobs(frame, palette, roi, thresholds)}
+
+def positions_of(detections):
+    """Reduce detections to the ``{color: (x, y) or None}`` form used for ordering."""
+    return {color: (d.x, d.y) if d else None for color, d in detections.items()}
+
+def detect_colors(frame, palette=None, **thresholds):
+    """Detect every palette color in the frame and return their centroid positions."""
+    return positions_of(detect_color_details(frame, palette, **thresholds))
+
+def preview_hsv(frame, roi=None, max_width=PREVIEW_WIDTH):
+    """Downscaled HSV copy of the board region, cached by the UI for threshold tuning.
+
+    Returns ``(hsv, scale)`` where ``scale`` maps preview pixels back to frame pixels.
+    """
+    frame = to_bgr(frame)
+    crop, _, inside = crop_to_roi(frame, roi)
+    h, w = crop.shape[:2]
+    scale = max(1.0, w / float(max_width))
+    if scale > 1.0:
+        crop = cv2.resize(crop, (int(w / scale), int(h / scale)), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    if inside is not None:
+        inside = cv2.resize(inside.view(np.uint8), (hsv.shape[1], hsv.shape[0]),
+                            interpolation=cv2.INTER_NEAREST).astype(bool)
+        hsv[~inside] = 0
+    return hsv, scale
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+SAMPLE_FRAMES = 5
+SAMPLE_WIDTH = 160
+MAX_WB_GAIN = 2.0
+MAX_BRIGHTNESS_GAIN = 3.0
+BRIGHT_PERCENTILE = 99
+IDENTITY_TOLERANCE = 0.02
+
+def sample_indices(frame_count, count=SAMPLE_FRAMES):
+    """Frame indices spread evenly over the video used to estimate the correction."""
+    if frame_count <= 0:
+        return set()
+    return set(np.linspace(0, frame_count - 1, min(count, frame_count)).astype(int).tolist())
+
+def downscale(frame, width=SAMPLE_WIDTH):
+    """Small copy of a frame; the statistics below do not need full resolution."""
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame.copy()
+    return cv2.resize(frame, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+
+def estimate_correction_lut(samples):
+    """Estimate gray-world white balance and a brightness gain from a few frames.
+
+    Returns a (1, 256, 3) uint8 table for ``cv2.LUT``, or ``None`` when the footage is
+    already balanced and the correction would be a no-op.
+    """
+    if not samples:
+        return None
+    pixels = np.concatenate([s.reshape(-1, 3) for s in samples]).astype(np.float64)
+    means = np.maximum(pixels.mean(axis=0), 1.0)
+    wb_gains = np.clip(means.mean() / means, 1 / MAX_WB_GAIN, MAX_WB_GAIN)
+    bright = np.percentile((pixels * wb_gains).max(axis=1), BRIGHT_PERCENTILE)
+    gains = wb_gains * np.clip(255.0 / max(bright, 1.0), 1.0, MAX_BRIGHTNESS_GAIN)
+    if np.all(np.abs(gains - 1.0) <= IDENTITY_TOLERANCE):
+        return None
+    levels = np.arange(256, dtype=np.float64)[:, None] * gains[None, :]
+    return np.clip(levels + 0.5, 0, 255).astype(np.uint8).reshape(1, 256, 3)
+
+def apply_correction(frame, lut):
+    """Apply a precomputed correction table; a table lookup per channel, no float math."""
+    if lut is None:
+        return frame
+    return cv2.LUT(frame, lut)
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ANALYSIS_WORKERS = int(os.environ.get("COLOR_ANALYSIS_WORKERS", 2))
+MAX_QUEUED_JOBS = int(os.environ.get("COLOR_MAX_QUEUED_JOBS", 20))
+JOB_TTL_SECONDS = float(os.environ.get("COLOR_JOB_TTL_SECONDS", 3600))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+log = logging.getLogger(__name__)
+
+class QueueFull(RuntimeError):
+    """Raised by :meth:`JobManager.submit` when the wait queue is at capacity."""
+
+class Job:
+    """State of one background analysis, updated by its worker and read by polling sessions."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.state = QUEUED
+        self.stage = "Waiting for a worker"
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._stage_started = time.monotonic()
+
+    def report(self, stage, done=0, total=None):
+        """Progress callback handed to the job: current stage and items done out of ``total``."""
+        if stage != self.stage:
+            self._stage_started = time.monotonic()
+        self.stage, self.done, self.total = stage, done, total
+
+    def eta(self):
+        """Seconds left in the current stage, extrapolated from its progress, or ``None``."""
+        if not self.done or not self.total:
+            return None
+        elapsed = time.monotonic() - self._stage_started
+        return elapsed * (self.total - self.done) / self.done
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+class JobManager:
+    """Runs analyses on a fixed pool of worker threads, independent of any browser session.
+
+    At most ``workers`` analyses run at once and at most ``max_queued`` wait for a worker;
+    further submissions are refused rather than left to exhaust memory with queued uploads.
+    Jobs are looked up by ID, so a rerun or a reconnecting session can pick up a job's
+    progress or finished result from wherever it was submitted.
+
+    Each job's result holds all of its artifacts in memory, so concurrent analyses never
+    share files. Finished jobs are dropped ``ttl`` seconds after they end, swept whenever
+    jobs are submitted or looked up.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, max_queued=MAX_QUEUED_JOBS, ttl=JOB_TTL_SECONDS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._jobs = {}
+        self._queue = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, progress=job.report, **kwargs)`` and return the new job's ID.
+
+        Raises :class:`QueueFull` when ``max_queued`` jobs are already waiting.
+        """
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            self._sweep()
+            if len(self._queue) >= self.max_queued:
+                raise QueueFull(f"The server is busy: {len(self._queue)} analyses are already "
+                                "waiting. Please try again in a minute.")
+            self._jobs[job.id] = job
+            self._queue.append(job.id)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def queue_position(self, job_id):
+        """1-based place of a waiting job in the queue, or ``None`` once it has started."""
+        with self._lock:
+            return self._queue.index(job_id) + 1 if job_id in self._queue else None
+
+    def queue_length(self):
+        with self._lock:
+            return len(self._queue)
+
+    def get(self, job_id):
+        """The job with ``job_id``, or ``None`` if it is unknown, expired or lost in a restart."""
+        with self._lock:
+            self._sweep()
+            return self._jobs.get(job_id)
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._queue.remove(job.id)
+        job.state = RUNNING
+        job.report("Starting")
+        try:
+            job.result = fn(*args, progress=job.report, **kwargs)
+            job.state = DONE
+        except Exception as e:
+            log.exception("Analysis job %s failed", job.id)
+            job.error = str(e) or type(e).__name__
+            job.state = FAILED
+        finally:
+            job.finished = time.time()
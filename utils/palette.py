@@ -0,0 +1,132 @@
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from utils.profiles import DEFAULT_PALETTE_PATH, read_palette_definition
+
+HUE_MAX = 180
+CHANNEL_MAX = 256
+LUMA_SHIFT = 2
+
+class Palette:
+    """Named colors with their HSV ranges, compiled into a single label lookup table.
+
+    Label 0 is background; label i + 1 is ``names[i]``. Classifying a pixel is one
+    table lookup no matter how many colors the palette holds.
+    """
+
+    def __init__(self, name, colors):
+        if not colors:
+            raise ValueError(f"Palette '{name}' defines no colors")
+        if len(colors) > 255:
+            raise ValueError(f"Palette '{name}' has {len(colors)} colors; at most 255 are supported")
+        self.name = name
+        self.names = [c["name"] for c in colors]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Palette '{name}' has duplicate color names")
+        self.display_colors = {c["name"]: c.get("display", "#000000") for c in colors}
+        self.ranges = {c["name"]: [(tuple(r["lower"]), tuple(r["upper"])) for r in c["hsv_ranges"]]
+                       for c in colors}
+        self.lut = self._compile()
+        self._yuv_tables = None
+
+    def _compile(self):
+        """Rasterise every HSV range into a (H, S, V) -> label table, rejecting overlaps."""
+        lut = np.zeros((HUE_MAX, CHANNEL_MAX, CHANNEL_MAX), dtype=np.uint8)
+        for label, color in enumerate(self.names, start=1):
+            for lower, upper in self.ranges[color]:
+                _check_range(color, lower, upper)
+                for h0, h1 in _hue_spans(lower[0], upper[0]):
+                    block = lut[h0:h1 + 1, lower[1]:upper[1] + 1, lower[2]:upper[2] + 1]
+                    taken = block[(block != 0) & (block != label)]
+                    if taken.size:
+                        other = self.names[int(taken[0]) - 1]
+                        raise ValueError(
+                            f"Palette '{self.name}': HSV range of {color} overlaps {other}")
+                    block[...] = label
+        return lut
+
+    def classify(self, hsv):
+        """Return a uint8 label image for an HSV frame (0 = no palette color)."""
+        h, s, v = (hsv[..., i].astype(np.int32) for i in range(3))
+        index = (np.minimum(h, HUE_MAX - 1) << 16) | (s << 8) | v
+        return self.lut.ravel().take(index)
+
+    def classify_yuv(self, yuv):
+        """Return ``(labels, saturation)`` for a chroma-resolution (Y, U, V) image.
+
+        Decoder YUV is classified directly through tables built lazily from the HSV table,
+        with luma quantised to 64 levels, so no BGR or HSV conversion is needed.
+        """
+        labels_lut, saturation_lut = self._yuv_lookup()
+        y, u, v = (yuv[..., i].astype(np.int32) for i in range(3))
+        index = ((y >> LUMA_SHIFT) << 16) | (u << 8) | v
+        return labels_lut.ravel().take(index), saturation_lut.ravel().take(index)
+
+    def _yuv_lookup(self):
+        if self._yuv_tables is None:
+            levels = CHANNEL_MAX >> LUMA_SHIFT
+            y, u, v = np.meshgrid((np.arange(levels) << LUMA_SHIFT) + (1 << LUMA_SHIFT) // 2,
+                                  np.arange(CHANNEL_MAX), np.arange(CHANNEL_MAX), indexing="ij")
+            hsv = cv2.cvtColor(_yuv_to_bgr(y, u, v).reshape(-1, 1, 3), cv2.COLOR_BGR2HSV)
+            shape = (levels, CHANNEL_MAX, CHANNEL_MAX)
+            self._yuv_tables = (self.classify(hsv).reshape(shape), hsv[..., 1].reshape(shape))
+        return self._yuv_tables
+
+def _yuv_to_bgr(y, u, v):
+    """BT.601 limited-range YUV to 8-bit BGR, the decoder's default for yuv420p video."""
+    c = 1.164 * (y.astype(np.float32) - 16)
+    d = u.astype(np.float32) - 128
+    e = v.astype(np.float32) - 128
+    bgr = np.stack([c + 2.017 * d, c - 0.392 * d - 0.813 * e, c + 1.596 * e], axis=-1)
+    return np.clip(bgr + 0.5, 0, 255).astype(np.uint8)
+
+def _hue_spans(h0, h1):
+    """Split a hue interval into contiguous spans, wrapping past 179 when ``h0 > h1``."""
+    if h0 <= h1:
+        return [(h0, h1)]
+    return [(h0, HUE_MAX - 1), (0, h1)]
+
+def _check_range(color, lower, upper):
+    if len(lower) != 3 or len(upper) != 3:
+        raise ValueError(f"{color}: HSV bounds must have three components")
+    for value in (lower[0], upper[0]):
+        if not 0 <= value < HUE_MAX:
+            raise ValueError(f"{color}: hue {value} outside 0-{HUE_MAX - 1}")
+    for lo, hi in zip(lower[1:], upper[1:]):
+        if not 0 <= lo <= hi < CHANNEL_MAX:
+            raise ValueError(f"{color}: saturation/value bounds {lo}-{hi} invalid")
+
+def palette_from_dict(data):
+    """Build a :class:`Palette` from its JSON representation."""
+    return Palette(data.get("name", "custom"), data["colors"])
+
+def palette_to_dict(palette):
+    """Inverse of :func:`palette_from_dict`, suitable for ``json.dump``."""
+    return {
+        "name": palette.name,
+        "colors": [
+            {"name": color, "display": palette.display_colors[color],
+             "hsv_ranges": [{"lower": list(lower), "upper": list(upper)}
+                            for lower, upper in palette.ranges[color]]}
+            for color in palette.names
+        ],
+    }
+
+def load_palette(path=DEFAULT_PALETTE_PATH):
+    """Load and compile a palette definition file, recompiling only when the file changes."""
+    return _load_palette(path, os.path.getmtime(path))
+
+@lru_cache(maxsize=8)
+def _load_palette(path, mtime):
+    return palette_from_dict(read_palette_definition(path))
+
+def hsv_range_mask(hsv, lower, upper):
+    """Binary mask of one HSV range with ``cv2.inRange``, honouring hue wrap-around."""
+    mask = None
+    for h0, h1 in _hue_spans(lower[0], upper[0]):
+        part = cv2.inRange(hsv, np.array([h0, lower[1], lower[2]]), np.array([h1, upper[1], upper[2]]))
+        mask = part if mask is None else mask | part
+    return mask
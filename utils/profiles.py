@@ -0,0 +1,30 @@
+import json
+import os
+import re
+
+DEFAULT_PALETTE_PATH = os.environ.get(
+    "COLOR_PALETTE", os.path.join(os.path.dirname(__file__), "palette.json"))
+PROFILE_DIR = os.environ.get("COLOR_PROFILE_DIR", "profiles")
+
+def profile_path(name):
+    """Path of the profile stored under ``name``, rejecting names that could escape PROFILE_DIR."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name or ""):
+        raise ValueError("Profile names may only contain letters, digits, '-' and '_'")
+    return os.path.join(PROFILE_DIR, f"{name}.json")
+
+def palette_path(profile=None):
+    """Definition file for a profile name, or the default palette for ``None``/``"Default"``."""
+    if not profile or profile == "Default":
+        return DEFAULT_PALETTE_PATH
+    return profile_path(profile)
+
+def read_palette_definition(path=DEFAULT_PALETTE_PATH):
+    """Raw JSON of a palette file, enough to list and display its colors without compiling it."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def list_profiles():
+    """Names of all saved calibration profiles."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
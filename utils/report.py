@@ -0,0 +1,179 @@
+import os
+import time
+import uuid
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+
+CHART_WIDTH = 300
+CHART_HEIGHT = 250
+FRAME_WIDTH = 200
+FRAME_GAP = 15
+
+FEEDBACK = [
+    (90, "🏆 Excellent! You're a Color Master!", "success"),
+    (70, "🎯 Great job! Keep it up!", "info"),
+    (0, "⚡ Try again to improve your score!", "warning"),
+]
+
+def feedback_for(accuracy):
+    """Feedback line and Streamlit alert level (``success``/``info``/``warning``) for an accuracy."""
+    for threshold, text, level in FEEDBACK:
+        if accuracy >= threshold:
+            return text, level
+    return FEEDBACK[-1][1:]
+
+def result_summary(mode, target_order, score, duration, player=None):
+    """The "Performance Summary" fields of a report for one scored board."""
+    data = {"Player": player} if player else {}
+    data.update({
+        "Arrangement Mode": mode.title(),
+        "Generated Order": ", ".join(target_order),
+        "Detected Order": ", ".join(score["detected_order"]),
+        "Correctly Placed": score["correct_count"],
+        "Correct Colors": ", ".join(score["correct_colors"]) if score["correct_colors"] else "None",
+        "Wrongly Placed": score["wrong_count"],
+        "Accuracy (%)": score["accuracy"],
+        "Challenge Duration": duration,
+        "Result": "Correct" if score["correct_count"] == len(target_order) else "Incorrect"
+    })
+    return data
+
+def report_file_name():
+    """Download/persistence name that cannot collide between same-second requests."""
+    return f"Color_Challenge_Report_{int(time.time())}_{uuid.uuid4().hex[:8]}.pdf"
+
+def directory_persistence(directory):
+    """Persistence hook that writes each report into ``directory``."""
+    def persist(pdf_bytes, file_name):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, file_name), "wb") as f:
+            f.write(pdf_bytes)
+    return persist
+
+@lru_cache(maxsize=None)
+def pie_chart_drawing(correct_count, total):
+    """Vector accuracy pie for the PDF, built once per distinct result from the counts alone."""
+    slices = [(label, value, color) for label, value, color in
+              (("Correct", correct_count, "#7CFC00"), ("Wrong", total - correct_count, "#FF6F61"))
+              if value > 0]
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    pie = Pie()
+    pie.x, pie.y = (CHART_WIDTH - 180) / 2, (CHART_HEIGHT - 180) / 2
+    pie.width = pie.height = 180
+    pie.data = [value for _, value, _ in slices]
+    pie.labels = [f"{label} {value / total:.1%}" for label, value, _ in slices]
+    pie.startAngle = 90
+    pie.direction = "anticlockwise"
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontName = "Helvetica"
+    pie.slices.fontSize = 12
+    for i, (_, _, color) in enumerate(slices):
+        pie.slices[i].fillColor = colors.HexColor(color)
+    drawing.add(pie)
+    return drawing
+
+def _use_form(pdf, name, draw, x=0, y=0, lowery=0):
+    """Draw static content through a Form XObject compiled once per document.
+
+    The first use records ``draw(pdf)`` as a form; later pages, and later reports in the
+    same document, only reference it, which is both faster and smaller. Forms are clipped
+    to their bounding box, so content below y=0 (e.g. descenders) needs a negative ``lowery``.
+    """
+    if not pdf.hasForm(name):
+        pdf.beginForm(name, lowery=lowery)
+        draw(pdf)
+        pdf.endForm()
+    pdf.saveState()
+    pdf.translate(x, y)
+    pdf.doForm(name)
+    pdf.restoreState()
+
+def _page_chrome(pdf):
+    width, height = A4
+
+    pdf.setStrokeColor(colors.black)
+    pdf.setLineWidth(3)
+    pdf.rect(30, 30, width - 60, height - 60)
+
+    pdf.setFont("Helvetica-Bold", 18)
+    pdf.setFillColor(colors.darkblue)
+    pdf.drawCentredString(width / 2, 780, "Color Arrangement Challenge Report")
+
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(100, 740, "Performance Summary:")
+
+def _heading(text, size):
+    def draw(pdf):
+        pdf.setFont("Helvetica-Bold", size)
+        pdf.setFillColor(colors.darkblue)
+        pdf.drawString(0, 0, text)
+    return draw
+
+def draw_report_page(pdf, data, correct_count, total, feedback_text, frame_jpeg=None):
+    """Draw one report onto the current page of ``pdf`` (the caller calls ``showPage``).
+
+    ``frame_jpeg`` is the annotated frame as already encoded for the UI; it is embedded
+    as-is next to the chart, and repeated bytes are stored once per document.
+    """
+    _use_form(pdf, "page_chrome", _page_chrome)
+
+    y = 715
+    pdf.setFont("Helvetica", 12)
+    pdf.setFillColor(colors.black)
+    for key, value in data.items():
+        line = f"{key}: {value}"
+        if len(line) > 90:
+            parts = [line[i:i+90] for i in range(0, len(line), 90)]
+            for part in parts:
+                pdf.drawString(100, y, part)
+                y -= 15
+        else:
+            pdf.drawString(100, y, line)
+            y -= 18
+    y -= 20
+
+    if total > 0:
+        _use_form(pdf, "heading_accuracy", _heading("Accuracy Overview:", 14), 100, y, -14)
+        y -= CHART_HEIGHT + 40
+        chart_x = 150
+        if frame_jpeg:
+            chart_x = 40
+            frame_x = chart_x + pie_chart_drawing(correct_count, total).getBounds()[2] + FRAME_GAP
+            frame = ImageReader(BytesIO(frame_jpeg))
+            frame_w, frame_h = frame.getSize()
+            height = min(CHART_HEIGHT, FRAME_WIDTH * frame_h / frame_w)
+            pdf.drawImage(frame, frame_x, y + (CHART_HEIGHT - height) / 2,
+                          width=height * frame_w / frame_h, height=height)
+        _use_form(pdf, f"pie_{correct_count}_{total}",
+                  lambda form: renderPDF.draw(pie_chart_drawing(correct_count, total), form, 0, 0), chart_x, y)
+        y -= 40
+
+    _use_form(pdf, "heading_feedback", _heading("Feedback:", 13), 100, y, -13)
+    y -= 20
+    pdf.setFont("Helvetica", 12)
+    pdf.setFillColor(colors.black)
+    pdf.drawString(120, y, feedback_text)
+
+def generate_pdf_report(data, correct_count, total, feedback_text, file_name=None, persist=None,
+                        frame_jpeg=None):
+    """Render the report into memory and return the PDF bytes.
+
+    ``persist``, if given, is called as ``persist(pdf_bytes, file_name)`` to keep a copy,
+    e.g. :func:`directory_persistence`; nothing touches disk otherwise.
+    """
+    buffer = BytesIO()
+    pdf = pdf_canvas.Canvas(buffer, pagesize=A4)
+    draw_report_page(pdf, data, correct_count, total, feedback_text, frame_jpeg)
+    pdf.save()
+    pdf_bytes = buffer.getvalue()
+    if persist is not None:
+        persist(pdf_bytes, file_name or report_file_name())
+    return pdf_bytes
@@ -0,0 +1,46 @@
+import numpy as np
+
+def roi_bounds(roi, shape):
+    """Pixel bounding box ``(x0, y0, x1, y1)`` of a region given in frame fractions.
+
+    ``roi`` is ``{"shape": "rect", "x0", "y0", "x1", "y1"}`` or
+    ``{"shape": "circle", "cx", "cy", "r"}`` with the radius relative to the shorter side.
+    Raises ``ValueError`` when the region covers no pixels of the frame.
+    """
+    h, w = shape[:2]
+    if roi["shape"] == "circle":
+        r = roi["r"] * min(w, h)
+        box = (roi["cx"] * w - r, roi["cy"] * h - r, roi["cx"] * w + r, roi["cy"] * h + r)
+    else:
+        box = (roi["x0"] * w, roi["y0"] * h, roi["x1"] * w, roi["y1"] * h)
+    x0, y0 = max(0, int(box[0])), max(0, int(box[1]))
+    x1, y1 = min(w, int(round(box[2]))), min(h, int(round(box[3])))
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError("The board region is empty; widen it to cover part of the frame.")
+    return x0, y0, x1, y1
+
+def roi_center(roi, shape):
+    """Centre of the region in pixels, or of the whole frame when there is no region."""
+    h, w = shape[:2]
+    if not roi:
+        return (w // 2, h // 2)
+    x0, y0, x1, y1 = roi_bounds(roi, shape)
+    return ((x0 + x1) // 2, (y0 + y1) // 2)
+
+def crop_to_roi(frame, roi):
+    """Crop a frame to its region before any per-pixel work.
+
+    Returns ``(crop, (x0, y0), inside)`` where ``inside`` is a boolean mask of the circle
+    within the crop, or ``None`` for rectangles and when there is no region.
+    """
+    if not roi:
+        return frame, (0, 0), None
+    x0, y0, x1, y1 = roi_bounds(roi, frame.shape)
+    crop = frame[y0:y1, x0:x1]
+    if roi["shape"] != "circle":
+        return crop, (x0, y0), None
+    h, w = frame.shape[:2]
+    cx, cy, r = roi["cx"] * w - x0, roi["cy"] * h - y0, roi["r"] * min(w, h)
+    ys, xs = np.ogrid[:crop.shape[0], :crop.shape[1]]
+    inside = (xs + 0.5 - cx) ** 2 + (ys + 0.5 - cy) ** 2 <= r * r
+    return crop, (x0, y0), inside
@@ -0,0 +1,30 @@
+import math
+
+def angle_from_top_clockwise(x, y, cx, cy):
+    """Angle of (x, y) around the board centre, used to order circular arrangements."""
+    dx, dy = x - cx, cy - y
+    angle = math.atan2(dx, -dy)
+    return (360 - (math.degrees(angle) - 240)) % 360
+
+def order_colors(positions, mode, center):
+    """Return the detected color names in arrangement order ("linear" or "circular")."""
+    found = [(color, pos) for color, pos in positions.items() if pos]
+    if mode.lower() == "linear":
+        found.sort(key=lambda c: c[1][0])
+    else:
+        cx, cy = center
+        found.sort(key=lambda c: angle_from_top_clockwise(c[1][0], c[1][1], cx, cy))
+    return [color for color, _ in found]
+
+def score_order(target_order, detected):
+    """Compare a detected order against the target and summarise the result."""
+    correct_colors = [color for i, color in enumerate(target_order)
+                      if i < len(detected) and detected[i] == color]
+    correct_count = len(correct_colors)
+    return {
+        "detected_order": detected,
+        "correct_colors": correct_colors,
+        "correct_count": correct_count,
+        "wrong_count": len(target_order) - correct_count,
+        "accuracy": round((correct_count / len(target_order)) * 100, 2),
+    }
@@ -0,0 +1,4 @@
+# Detection defaults, kept free of heavy imports so the UI can read them at page load.
+MIN_AREA = 150
+MIN_FILL_RATIO = 0.2
+MIN_SATURATION = 0
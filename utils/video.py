@@ -0,0 +1,130 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from utils.illumination import apply_correction, downscale, estimate_correction_lut, sample_indices
+
+@contextmanager
+def memory_video_path(data, suffix=".mp4"):
+    """Expose in-memory video bytes as a path ``cv2.VideoCapture`` can open.
+
+    On Linux the bytes go into an anonymous memfd opened through ``/proc/self/fd``, so the
+    upload never reaches persistent disk. Elsewhere a temporary file is used and removed.
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("upload")
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            yield f"/proc/self/fd/{fd}"
+        finally:
+            os.close(fd)
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        try:
+            with tmp:
+                tmp.write(data)
+            yield tmp.name
+        finally:
+            os.remove(tmp.name)
+
+def is_i420(frame):
+    """Raw decoder frames are single-channel I420: a Y plane followed by the U and V planes."""
+    return frame.ndim == 2
+
+def chroma_yuv(frame):
+    """(Y, U, V) image at chroma resolution from an I420 frame, luma subsampled 2x2."""
+    h = frame.shape[0] * 2 // 3
+    w = frame.shape[1]
+    u = frame[h:h + h // 4].reshape(h // 2, w // 2)
+    v = frame[h + h // 4:h + h // 2].reshape(h // 2, w // 2)
+    return np.dstack([frame[:h:2, ::2], u, v])
+
+def to_bgr(frame):
+    """BGR version of a frame, converting raw I420 frames only when something must be drawn."""
+    return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420) if is_i420(frame) else frame
+
+@lru_cache(maxsize=None)
+def raw_yuv_supported():
+    """Whether the video backend returns planar I420 frames when its BGR conversion is off.
+
+    Probed once by encoding and decoding a tiny clip. Some builds (e.g. the opencv-python
+    wheels with FFmpeg) hand back only the luma plane, in which case raw decoding is skipped.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "probe.mp4")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+        if not writer.isOpened():
+            return False
+        for _ in range(2):
+            writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+        writer.release()
+        cap = cv2.VideoCapture(path)
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        ret, frame = cap.read()
+        cap.release()
+    return bool(ret) and is_i420(frame) and frame.shape == (72, 64)
+
+def read_video(source, normalize=False, raw_yuv=False, progress=None):
+    """Decode a video (a path or the raw bytes of an upload) and return ``(last_frame, duration_seconds)``.
+
+    With ``normalize`` a lighting correction is estimated once from a few frames sampled
+    while decoding and applied to the returned frame as a lookup table.
+
+    With ``raw_yuv`` (ignored when normalizing) the decoder's BGR conversion is turned off
+    and the last frame is returned as raw I420, which detection classifies from its YUV
+    planes. Backends that cannot deliver planar I420 (see :func:`raw_yuv_supported`) use
+    normal BGR decoding.
+
+    ``progress``, if given, is called as ``progress(frames_decoded, frame_count)`` after
+    every frame; ``frame_count`` is ``None`` when the container does not report it.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        with memory_video_path(source) as path:
+            return read_video(path, normalize, raw_yuv, progress)
+
+    raw_yuv = raw_yuv and not normalize and raw_yuv_supported()
+    cap = cv2.VideoCapture(source)
+    if raw_yuv:
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = frame_count / fps if fps > 0 else 0
+    wanted = sample_indices(frame_count) if normalize else set()
+
+    last_frame = None
+    samples = []
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if raw_yuv and index == 0 and not (is_i420(frame) and frame.shape[0] == height * 3 // 2):
+            cap.release()
+            return read_video(source, normalize, progress=progress)
+        if index in wanted:
+            samples.append(downscale(frame))
+        last_frame = frame
+        index += 1
+        if progress:
+            progress(index, frame_count if frame_count > 0 else None)
+    cap.release()
+
+    if normalize and last_frame is not None:
+        if not samples:
+            samples.append(downscale(last_frame))
+        last_frame = apply_correction(last_frame, estimate_correction_lut(samples))
+    return last_frame, duration
+
+def decode_image(data, normalize=False):
+    """Decode an uploaded JPEG/PNG straight from memory; returns ``None`` if undecodable."""
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if normalize and frame is not None:
+        frame = apply_correction(frame, estimate_correction_lut([downscale(frame)]))
+    return frame